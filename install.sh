@@ -737,13 +737,23 @@ install_from_local() {
     chmod +x "$INSTALL_DIR/scripts/parse-manifest.sh"
 
     # TOML parser runtime dependency (used by lib/config.sh workspace/config operations)
-    if [[ ! -f "$source_dir/parse-toml.py" ]]; then
-        error "Required runtime file missing: $source_dir/parse-toml.py"
-        exit 1
-    fi
-    cp "$source_dir/parse-toml.py" "$INSTALL_DIR/parse-toml.py"
+    # parse-toml.py is a thin entry point; the implementation is containai_toml.py
+    local toml_file
+    for toml_file in parse-toml.py containai_toml.py; do
+        if [[ ! -f "$source_dir/$toml_file" ]]; then
+            error "Required runtime file missing: $source_dir/$toml_file"
+            exit 1
+        fi
+        cp "$source_dir/$toml_file" "$INSTALL_DIR/$toml_file"
+    done
     chmod +x "$INSTALL_DIR/parse-toml.py"
 
+    # Precompile the parser module so the first config lookup does not pay
+    # for compiling it (best effort: Python also caches it on first import)
+    if command -v python3 >/dev/null 2>&1; then
+        python3 -m compileall -q "$INSTALL_DIR/containai_toml.py" >/dev/null 2>&1 || true
+    fi
+
     # Manifests directory
     if ! compgen -G "$source_dir/manifests/*.toml" >/dev/null; then
         error "No manifest files found in $source_dir/manifests/"
@@ -21,6 +21,7 @@
 #   ├── scripts/
 #   │   └── parse-manifest.sh   # ONLY this runtime script
 #   ├── parse-toml.py           # TOML parser runtime dependency
+#   ├── containai_toml.py       # TOML parser implementation (imported by parse-toml.py)
 #   ├── manifests/              # Per-agent manifest files (required by sync.sh)
 #   ├── templates/              # User templates
 #   ├── container/              # Container runtime assets (template wrapper Dockerfile)
@@ -148,6 +149,7 @@ chmod +x "$PACKAGE_DIR/scripts/parse-manifest.sh"
 printf '  Copying parse-toml.py...\n'
 cp "$SRC_DIR/parse-toml.py" "$PACKAGE_DIR/parse-toml.py"
 chmod +x "$PACKAGE_DIR/parse-toml.py"
+cp "$SRC_DIR/containai_toml.py" "$PACKAGE_DIR/containai_toml.py"
 
 # Copy manifests directory (runtime dependency of sync.sh)
 printf '  Copying manifests/...\n'
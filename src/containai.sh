@@ -3054,7 +3054,7 @@ _containai_config_set_cmd() {
             if [[ -f "$user_config_file" ]] && command -v python3 >/dev/null 2>&1; then
                 local script_dir
                 if script_dir="$(cd -- "$(dirname "${BASH_SOURCE[0]}")" && pwd)"; then
-                    if config_json=$(python3 "$script_dir/lib/../parse-toml.py" --file "$user_config_file" --json 2>/dev/null); then
+                    if config_json=$(_containai_parse_toml "$script_dir/lib/.." --file "$user_config_file" --json 2>/dev/null); then
                         matched_ws=$(printf '%s' "$config_json" | _containai_find_matching_workspace "$target_workspace" 2>/dev/null) || true
                         if [[ -n "$matched_ws" ]]; then
                             final_workspace="$matched_ws"
@@ -3182,7 +3182,7 @@ _containai_config_unset_cmd() {
             if [[ -f "$user_config_file" ]] && command -v python3 >/dev/null 2>&1; then
                 local script_dir
                 if script_dir="$(cd -- "$(dirname "${BASH_SOURCE[0]}")" && pwd)"; then
-                    if config_json=$(python3 "$script_dir/lib/../parse-toml.py" --file "$user_config_file" --json 2>/dev/null); then
+                    if config_json=$(_containai_parse_toml "$script_dir/lib/.." --file "$user_config_file" --json 2>/dev/null); then
                         matched_ws=$(printf '%s' "$config_json" | _containai_find_matching_workspace "$target_workspace" 2>/dev/null) || true
                         if [[ -n "$matched_ws" ]]; then
                             final_workspace="$matched_ws"
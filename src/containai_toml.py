@@ -0,0 +1,1892 @@
+#!/usr/bin/env python3
+"""
+containai_toml.py - Minimal TOML config parser for shell script consumption.
+
+Implementation behind the parse-toml.py CLI. Kept as an importable module so
+Python caches its bytecode in __pycache__; a script run directly is
+recompiled from source on every call.
+
+Provides a CLI interface for reading TOML configuration values, suitable
+for calling from shell scripts that need to access config settings.
+
+Usage:
+    python3 parse-toml.py --file config.toml --key agent.data_volume
+    python3 parse-toml.py --file config.toml --json
+    python3 parse-toml.py --file config.toml --exists agent.data_volume
+    python3 parse-toml.py --file config.toml --env
+    python3 parse-toml.py --file config.toml --set-workspace-key /path key value
+    python3 parse-toml.py --file config.toml --get-workspace /path
+"""
+from __future__ import annotations
+
+import errno
+import marshal
+import os
+import stat
+import sys
+import zlib
+
+# Heavier modules (argparse, json, pathlib, re, tempfile) are imported where
+# they are used: the common --key lookup needs none of them, and shell scripts
+# pay this process's startup cost on every call.
+
+# Sentinel for "key not found" (distinct from None which is a valid TOML value)
+_NOT_FOUND = object()
+
+# Tuple of decode exception types for `except`; replaced once a TOML parser
+# is imported
+_TOML_DECODE_ERROR: tuple[type[Exception], ...] = (Exception,)
+
+
+def _import_toml_parser():
+    """
+    Import a TOML parser on first use (cache hits never need one).
+
+    Fallback chain: rtoml (Rust, optional) -> pytomlpp (C++, optional) ->
+    tomllib (3.11+) -> tomli (backport, installed via python3-tomli) -> toml (legacy)
+
+    The compiled parsers are several times faster than tomllib on large
+    configs and return the same types; they are used only if installed.
+
+    Returns:
+        The parser's loads(str) -> dict function
+    """
+    global _TOML_DECODE_ERROR
+
+    try:
+        import rtoml
+
+        _TOML_DECODE_ERROR = (rtoml.TomlParsingError,)
+        return rtoml.loads
+    except ImportError:
+        pass
+
+    try:
+        import pytomlpp
+
+        _TOML_DECODE_ERROR = (pytomlpp.DecodeError,)
+        return pytomlpp.loads
+    except ImportError:
+        pass
+
+    # Python 3.11+ has tomllib in stdlib
+    try:
+        import tomllib
+
+        _TOML_DECODE_ERROR = (tomllib.TOMLDecodeError,)
+        return tomllib.loads
+    except ImportError:
+        pass
+
+    # tomli is the backport of tomllib for Python < 3.11
+    # Installed via python3-tomli on Debian/Ubuntu
+    try:
+        import tomli
+
+        _TOML_DECODE_ERROR = (tomli.TOMLDecodeError,)
+        return tomli.loads
+    except ImportError:
+        pass
+
+    # Legacy fallback to toml package
+    try:
+        import toml
+
+        _TOML_DECODE_ERROR = (toml.TomlDecodeError,)
+        return toml.loads
+    except ImportError:
+        pass
+
+    print(
+        "Error: No TOML parser available. Install 'tomli' or 'toml' package",
+        file=sys.stderr,
+    )
+    sys.exit(1)
+
+
+# On-disk parse cache: shell scripts call this tool many times per command.
+# Entries are validated against the raw file bytes rather than mtime, whose
+# granularity can miss same-size rewrites. marshal (builtin, cannot run code
+# on load) stores the result; configs with TOML datetimes are not cached.
+_PARSE_CACHE_VERSION = 1
+
+
+# Cache directory, resolved on first use (None: caching disabled). The
+# environment is fixed for the life of the process, so --serve need not
+# re-read $XDG_CACHE_HOME/$HOME on every request.
+_PARSE_CACHE_DIR = _NOT_FOUND
+
+
+def _parse_cache_file(path: str) -> str | None:
+    """
+    Return the cache file path used for a config file, or None.
+
+    A relative $XDG_CACHE_HOME is ignored, as the XDG spec requires; if
+    the home directory does not resolve to an absolute path either, there
+    is no cache, rather than one relative to the caller's working directory.
+    """
+    global _PARSE_CACHE_DIR
+    if _PARSE_CACHE_DIR is _NOT_FOUND:
+        cache_home = os.environ.get("XDG_CACHE_HOME", "")
+        if not os.path.isabs(cache_home):
+            home = os.path.expanduser("~")
+            cache_home = os.path.join(home, ".cache") if os.path.isabs(home) else None
+        _PARSE_CACHE_DIR = cache_home and os.path.join(cache_home, "containai", "toml")
+    if _PARSE_CACHE_DIR is None:
+        return None
+    abs_path = os.path.abspath(path)
+    slot = zlib.crc32(abs_path.encode("utf-8", "surrogateescape"))
+    return os.path.join(_PARSE_CACHE_DIR, f"{slot:08x}.marshal")
+
+
+def _read_parse_cache(cache_file: str, raw: bytes):
+    """
+    Return cached parse result for raw config bytes, or None on miss.
+
+    Any problem with the cache (missing, foreign-owned, corrupt, stale)
+    is treated as a miss.
+    """
+    try:
+        with open(cache_file, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.getuid() or st.st_mode & 0o022:
+                return None
+            entry = marshal.loads(f.read())
+        version, cached_raw, data = entry
+    except Exception:
+        return None
+    if version != (_PARSE_CACHE_VERSION, sys.hexversion) or cached_raw != raw:
+        return None
+    return data
+
+
+def _write_parse_cache(cache_file: str, raw: bytes, data: dict) -> None:
+    """Atomically store a parse result. Failures are silently ignored."""
+    try:
+        payload = marshal.dumps(((_PARSE_CACHE_VERSION, sys.hexversion), raw, data))
+    except ValueError:
+        # Unmarshallable value (e.g. TOML datetime) - skip caching
+        return
+    temp_path = f"{cache_file}.{os.getpid()}.tmp"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+    try:
+        try:
+            fd = os.open(temp_path, flags, 0o600)
+        except FileNotFoundError:
+            # Cache directory only needs creating on the very first write
+            os.makedirs(os.path.dirname(cache_file), mode=0o700, exist_ok=True)
+            fd = os.open(temp_path, flags, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(temp_path, cache_file)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def _read_file_bytes(path: str) -> bytes:
+    """
+    Read a whole file with a single read() sized from fstat.
+
+    Avoids the extra fstat/lseek/ioctl calls buffered open() makes. Reads
+    past the reported size until EOF in case the file grew meanwhile.
+    """
+    fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        st = os.fstat(fd)
+        if stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(errno.EISDIR, os.strerror(errno.EISDIR), path)
+        want = st.st_size + 1
+        data = os.read(fd, want)
+        if len(data) < want:
+            return data
+        chunks = [data]
+        while data:
+            data = os.read(fd, 65536)
+            chunks.append(data)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+
+# In-process parse results for --serve, which answers many requests for the
+# same few files: abspath -> (raw bytes, parsed dict). Validated against the
+# raw bytes like the on-disk cache. Read modes never mutate the parsed dict,
+# so entries are shared between requests. Oldest entry is evicted first.
+_PARSED: dict[str, tuple[bytes, dict]] = {}
+_PARSED_MAX = 8
+
+
+def load_toml(path: str) -> dict:
+    """
+    Load TOML file, reusing a cached parse result when content is unchanged.
+
+    Raises the same errors as reading and parsing the file directly
+    (OSError subclasses, _TOML_DECODE_ERROR, UnicodeDecodeError).
+    """
+    raw = _read_file_bytes(path)
+    abs_path = os.path.abspath(path)
+    entry = _PARSED.get(abs_path)
+    if entry is not None and entry[0] == raw:
+        return entry[1]
+
+    cache_file = _parse_cache_file(abs_path)
+    data = None if cache_file is None else _read_parse_cache(cache_file, raw)
+    if data is None:
+        toml_loads = _import_toml_parser()
+        data = toml_loads(raw.decode("utf-8"))
+        if cache_file is not None:
+            _write_parse_cache(cache_file, raw, data)
+
+    _PARSED.pop(abs_path, None)
+    if len(_PARSED) >= _PARSED_MAX:
+        del _PARSED[next(iter(_PARSED))]
+    _PARSED[abs_path] = (raw, data)
+    return data
+
+
+def _load_or_die(path: str, missing=_NOT_FOUND) -> dict:
+    """
+    Load a TOML file for a read mode, exiting 1 with a message on failure.
+
+    Args:
+        path: Path to the TOML file
+        missing: Returned instead of failing when the file does not exist
+
+    Returns:
+        The parsed config dict
+    """
+    try:
+        return load_toml(path)
+    except FileNotFoundError:
+        if missing is not _NOT_FOUND:
+            return missing
+        print(f"Error: File not found: {path}", file=sys.stderr)
+    except PermissionError:
+        print(f"Error: Permission denied: {path}", file=sys.stderr)
+    except IsADirectoryError:
+        print(f"Error: Path is a directory: {path}", file=sys.stderr)
+    except OSError as e:
+        print(f"Error: Cannot read file: {e}", file=sys.stderr)
+    except _TOML_DECODE_ERROR as e:
+        print(f"Error: Invalid TOML: {e}", file=sys.stderr)
+    except Exception as e:
+        # Catch-all for unexpected errors (bugs, edge cases in TOML libraries)
+        print(f"Error: Failed to parse file: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def get_nested_value(data: dict, key: str):
+    """
+    Get a nested value from a dict using dot notation.
+
+    Args:
+        data: The dict to search
+        key: Dot-separated key path (e.g., "agent.data_volume")
+
+    Returns:
+        The value if found, or _NOT_FOUND sentinel if not found
+    """
+    current = data
+    for part in key.split("."):
+        # Parsed TOML tables are plain dicts, so an exact type check suffices
+        if type(current) is not dict:
+            return _NOT_FOUND
+        current = current.get(part, _NOT_FOUND)
+        if current is _NOT_FOUND:
+            return _NOT_FOUND
+    return current
+
+
+# Scalar formatters keyed by exact type: parsed TOML only yields these
+# builtins, so one dict lookup replaces the isinstance() chain. Exact-type
+# keys also keep bool (an int subclass) away from str(), which prints "True".
+_SCALAR_FORMATTERS = {
+    str: lambda value: value,
+    bool: lambda value: "true" if value else "false",
+    int: str,
+    float: str,
+    type(None): lambda value: "",
+}
+
+
+def format_value(value) -> str:
+    """
+    Format a value for shell-friendly output.
+
+    - Strings are output as-is
+    - Booleans are output as lowercase "true"/"false"
+    - Numbers are output as strings
+    - Complex types (lists, dicts) are output as JSON
+
+    Args:
+        value: The value to format
+
+    Returns:
+        String representation suitable for shell consumption
+    """
+    formatter = _SCALAR_FORMATTERS.get(type(value))
+    if formatter is not None:
+        return formatter(value)
+    # For complex types (list, dict, datetime), output as compact JSON
+    # Use default=str to handle TOML datetime types
+    return _json_dumps(value, default=str, use_orjson=_PREFER_ORJSON)
+
+
+def validate_env_section(config):
+    """
+    Validate and extract the [env] section from config.
+
+    Validates types for:
+    - import: list of strings (missing/invalid treated as empty list with warning)
+    - from_host: boolean (default: false, invalid type is error)
+    - env_file: optional string (invalid type is error)
+
+    Per spec, env_file is always validated when [env] section exists, even if
+    import is missing or invalid. This ensures "fail closed" semantics.
+
+    Args:
+        config: The parsed TOML config dict
+
+    Returns:
+        Validated env config dict, or None if [env] section is missing.
+        Prints warnings to stderr for recoverable issues.
+
+    Raises:
+        SystemExit: If type validation fails for from_host or env_file
+    """
+    env_section = config.get("env")
+
+    # Missing [env] section - return None (not error)
+    if env_section is None:
+        return None
+
+    # [env] exists but is not a dict - error
+    if not isinstance(env_section, dict):
+        print("Error: [env] section must be a table/dict", file=sys.stderr)
+        sys.exit(1)
+
+    result = {}
+
+    # Validate 'env_file' key FIRST - per spec, always validated when [env] exists
+    # This ensures fail-closed semantics even if import is invalid
+    env_file = env_section.get("env_file")
+    if env_file is None:
+        # Optional - don't include in result if not present
+        pass
+    elif not isinstance(env_file, str):
+        print(
+            f"Error: [env].env_file must be a string, got {type(env_file).__name__}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    else:
+        result["env_file"] = env_file
+
+    # Validate 'from_host' key: must be boolean, default false
+    # Invalid type is an error (not recoverable)
+    from_host = env_section.get("from_host")
+    if from_host is None:
+        result["from_host"] = False
+    elif not isinstance(from_host, bool):
+        print(
+            f"Error: [env].from_host must be a boolean, got {type(from_host).__name__}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    else:
+        result["from_host"] = from_host
+
+    # Validate 'import' key: must be list of strings
+    # Per spec: missing or non-list is treated as [] with warning (fail-soft)
+    import_list = env_section.get("import")
+    if import_list is None:
+        # Missing import key - treat as empty list with warning
+        print("[WARN] [env].import missing, treating as empty list", file=sys.stderr)
+        result["import"] = []
+    elif not isinstance(import_list, list):
+        # Non-list - treat as empty list with warning (per spec)
+        print(
+            f"[WARN] [env].import must be a list, got {type(import_list).__name__}; treating as empty list",
+            file=sys.stderr,
+        )
+        result["import"] = []
+    else:
+        # Validate each item is a string, skip non-strings with warning.
+        # Filter in one pass; only walk the list again to report rejects.
+        validated_imports = [item for item in import_list if type(item) is str]
+        if len(validated_imports) != len(import_list):
+            warnings = [
+                f"[WARN] [env].import[{i}] must be a string, got {type(item).__name__}; skipping\n"
+                for i, item in enumerate(import_list)
+                if type(item) is not str
+            ]
+            sys.stderr.write("".join(warnings))
+        result["import"] = validated_imports
+
+    return result
+
+
+def get_workspace_state(config: dict, workspace_path: str) -> dict:
+    """
+    Get workspace state for a specific path from config.
+
+    Args:
+        config: The parsed TOML config dict
+        workspace_path: The workspace path (must be absolute, normalized)
+
+    Returns:
+        Dict with workspace state keys (data_volume, container_name, agent, created_at)
+        or empty dict if not found
+    """
+    workspaces = config.get("workspace", {})
+    if not isinstance(workspaces, dict):
+        return {}
+
+    ws_state = workspaces.get(workspace_path, {})
+    if not isinstance(ws_state, dict):
+        return {}
+
+    return ws_state
+
+
+def format_toml_string(value: str) -> str:
+    """
+    Format a string value for TOML output.
+
+    Uses basic strings with escaping. Literal strings are avoided because
+    TOML literal strings cannot contain control characters (tab, CR, etc).
+    """
+    # Check if value contains characters that need escaping
+    has_control = any(c in value for c in ["\n", "\r", "\t"])
+    has_special = any(c in value for c in ['"', "\\"])
+
+    if has_control or has_special:
+        # Always use escaped basic string for control chars or special chars
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        escaped = escaped.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+        return f'"{escaped}"'
+    return f'"{value}"'
+
+
+# Errors for which Path.exists() reports a file as absent
+_MISSING_ERRNOS = frozenset({errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP})
+
+
+def _read_config_text(file_path: Path, missing=_NOT_FOUND) -> str | None:
+    """
+    Read a config file for editing with a single read (see _read_file_bytes).
+
+    Newlines are translated as Path.read_text() does: CRLF and lone CR
+    become LF. If missing is given, it is returned when the file does not
+    exist, so callers need no separate exists() check.
+    """
+    try:
+        data = _read_file_bytes(os.fspath(file_path))
+    except OSError as e:
+        if missing is _NOT_FOUND or e.errno not in _MISSING_ERRNOS:
+            raise
+        return missing
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _atomic_write(file_path: Path, content: str, old_content: str | None = None) -> None:
+    """
+    Atomically replace file_path with content (mode 0600).
+
+    Writes a temp file in the same directory (so the rename stays on one
+    filesystem), fsyncs it, then renames it over the target. The temp file
+    is removed if anything fails; the original exception propagates.
+    Callers are responsible for creating the parent directory.
+
+    If old_content (what the caller read from file_path) equals content and
+    the file is already mode 0600, nothing is written: no-op updates skip
+    the temp file, fsync and rename.
+    """
+    if content == old_content:
+        try:
+            if stat.S_IMODE(os.stat(file_path).st_mode) == 0o600:
+                return
+        except OSError:
+            pass
+
+    import tempfile
+    from pathlib import Path
+
+    fd, temp_path = tempfile.mkstemp(
+        prefix=".config_", suffix=".tmp", dir=str(file_path.parent)
+    )
+    temp_path = Path(temp_path)
+
+    try:
+        # Write content with secure permissions using proper file object
+        # This ensures all bytes are written (os.write may be partial)
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        # fd is now closed by the context manager
+
+        # Atomic rename
+        temp_path.rename(file_path)
+    except Exception:
+        # Clean up temp file on failure
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def unset_workspace_key(file_path: Path, workspace_path: str, key: str) -> bool:
+    """
+    Unset (remove) a key from a workspace section atomically.
+
+    If the workspace section becomes empty after removing the key,
+    the entire section is removed.
+
+    Args:
+        file_path: Path to the TOML config file
+        workspace_path: The workspace path (key for [workspace."path"] table)
+        key: The key to unset
+
+    Returns:
+        True on success, False on failure (error printed to stderr)
+    """
+    import re
+
+    # Validate key name
+    if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", key):
+        print(f"Error: Invalid key name: {key}", file=sys.stderr)
+        return False
+
+    # Validate workspace path
+    if not workspace_path.startswith("/"):
+        print(f"Error: Workspace path must be absolute: {workspace_path}", file=sys.stderr)
+        return False
+
+    # Read existing file content
+    try:
+        content = _read_config_text(file_path, missing=None)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error: Cannot read file: {e}", file=sys.stderr)
+        return False
+    if content is None:
+        # Nothing to unset if file doesn't exist
+        return True
+
+    # Build the workspace table header
+    escaped_path = workspace_path.replace("\\", "\\\\").replace('"', '\\"')
+    ws_header = f'[workspace."{escaped_path}"]'
+
+    lines = content.split("\n")
+    new_lines = []
+    in_target_workspace = False
+    ws_start_idx = -1
+    ws_end_idx = -1
+    key_pattern = re.compile(rf"^{re.escape(key)}\s*=")
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        # Check if this is the target workspace header
+        header_part = stripped
+        if stripped.startswith("[") and stripped.endswith("]"):
+            header_part = stripped
+        elif stripped.startswith("[") and "#" in stripped:
+            close_bracket = stripped.rfind("]")
+            if close_bracket > 0:
+                header_part = stripped[:close_bracket + 1]
+
+        if header_part == ws_header:
+            in_target_workspace = True
+            ws_start_idx = len(new_lines)
+            new_lines.append(line)
+            i += 1
+            continue
+
+        # Check if we're entering a different section
+        if in_target_workspace and stripped.startswith("["):
+            ws_end_idx = len(new_lines)
+            in_target_workspace = False
+
+        # If we're in the target workspace, look for the key to remove
+        if in_target_workspace:
+            key_match = key_pattern.match(stripped)
+            if key_match:
+                # Skip this line (remove the key)
+                i += 1
+                continue
+
+        new_lines.append(line)
+        i += 1
+
+    # If we were still in target workspace at EOF
+    if in_target_workspace:
+        ws_end_idx = len(new_lines)
+
+    # Check if workspace section is now empty (only header and blank lines)
+    if ws_start_idx >= 0 and ws_end_idx > ws_start_idx:
+        has_content = False
+        for idx in range(ws_start_idx + 1, ws_end_idx):
+            if idx < len(new_lines):
+                line_stripped = new_lines[idx].strip()
+                # Skip blank lines and comments
+                if line_stripped and not line_stripped.startswith("#"):
+                    has_content = True
+                    break
+
+        if not has_content:
+            # Remove the entire workspace section (header and following blank lines)
+            # Remove lines from ws_start_idx to ws_end_idx - 1
+            del new_lines[ws_start_idx:ws_end_idx]
+            # Also remove any trailing blank lines before the next section
+            while new_lines and new_lines[-1].strip() == "":
+                new_lines.pop()
+
+    # Build final content
+    final_content = "\n".join(new_lines)
+    if final_content and not final_content.endswith("\n"):
+        final_content += "\n"
+
+    # Write atomically
+    try:
+        dir_path = file_path.parent
+        if not dir_path.exists():
+            return True  # Nothing to write if dir doesn't exist
+
+        _atomic_write(file_path, final_content, content)
+
+    except OSError as e:
+        print(f"Error: Cannot write file: {e}", file=sys.stderr)
+        return False
+
+    return True
+
+
+# Keys that should be integers (with port range validation)
+_PORT_KEYS = frozenset(
+    {
+        "port_range_start",
+        "port_range_end",
+        "ssh.port_range_start",
+        "ssh.port_range_end",
+    }
+)
+
+# Keys that should be booleans
+_BOOL_KEYS = frozenset(
+    {
+        "forward_agent",
+        "auto_prompt",
+        "exclude_priv",
+        "ssh.forward_agent",
+        "import.auto_prompt",
+        "import.exclude_priv",
+    }
+)
+
+
+def format_toml_value(key: str, value: str) -> str | None:
+    """
+    Format a value for TOML output with proper typing based on key.
+
+    Known keys with specific types:
+    - ssh.port_range_start, ssh.port_range_end: integers (1024-65535)
+    - ssh.forward_agent, import.auto_prompt: booleans
+    - Everything else: strings
+
+    Args:
+        key: The config key (used to determine type)
+        value: The value as a string
+
+    Returns:
+        TOML-formatted value (with quotes for strings, raw for ints/bools)
+        None if validation fails (error is printed to stderr)
+    """
+    # Get the last part of the key for matching nested keys
+    key_name = key.rpartition(".")[2]
+
+    # Check for port keys (require valid integer in range)
+    if key in _PORT_KEYS or key_name in _PORT_KEYS:
+        try:
+            port = int(value)
+            if port < 1024 or port > 65535:
+                print(
+                    f"Error: {key} must be between 1024 and 65535, got {port}",
+                    file=sys.stderr,
+                )
+                return None
+            return value  # Return raw integer for TOML
+        except ValueError:
+            print(
+                f"Error: {key} must be an integer, got '{value}'", file=sys.stderr
+            )
+            return None
+
+    # Check for boolean keys (require valid boolean)
+    if key in _BOOL_KEYS or key_name in _BOOL_KEYS:
+        # Convert to TOML boolean
+        lowered = value.lower()
+        if lowered in ("true", "1", "yes"):
+            return "true"
+        elif lowered in ("false", "0", "no"):
+            return "false"
+        print(
+            f"Error: {key} must be a boolean (true/false), got '{value}'",
+            file=sys.stderr,
+        )
+        return None
+
+    # Default: format as string
+    return format_toml_string(value)
+
+
+def set_global_key(file_path: Path, key: str, value: str) -> bool:
+    """
+    Set a global (top-level) key in config atomically.
+
+    Supports dot notation for nested keys (e.g., agent.default).
+    Values are typed appropriately based on the key name.
+
+    Args:
+        file_path: Path to the TOML config file
+        key: The key to set (dot notation for nested)
+        value: The value to set
+
+    Returns:
+        True on success, False on failure
+    """
+    import re
+
+    # Validate key name (allow dots for nesting)
+    if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_.]*$", key):
+        print(f"Error: Invalid key name: {key}", file=sys.stderr)
+        return False
+
+    parts = key.split(".")
+    if len(parts) > 2:
+        print(f"Error: Key nesting too deep (max 2 levels): {key}", file=sys.stderr)
+        return False
+
+    # Read existing content
+    try:
+        content = _read_config_text(file_path, missing="")
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error: Cannot read file: {e}", file=sys.stderr)
+        return False
+
+    lines = content.split("\n")
+    new_lines = []
+    # Pattern for a line assigning the key within its table (the last part
+    # of a dotted key), compiled once for the loop
+    key_pattern = re.compile(rf"^{re.escape(parts[-1])}\s*=")
+    # Format value with proper TOML type based on key
+    formatted_value = format_toml_value(key, value)
+    if formatted_value is None:
+        # Validation failed - error already printed
+        return False
+    kv_line = f"{parts[-1]} = {formatted_value}"
+
+    if len(parts) == 1:
+        # Top-level key
+        key_updated = False
+        in_table = False
+
+        for line in lines:
+            stripped = line.strip()
+
+            # Check if entering a table section
+            if stripped.startswith("["):
+                in_table = True
+                if not key_updated:
+                    # Insert the key before the first table
+                    new_lines.append(kv_line)
+                    key_updated = True
+                new_lines.append(line)
+                continue
+
+            # Check if this line sets the key (only if not in a table)
+            if not in_table:
+                key_match = key_pattern.match(stripped)
+                if key_match:
+                    new_lines.append(kv_line)
+                    key_updated = True
+                    continue
+
+            new_lines.append(line)
+
+        if not key_updated:
+            # Add at end if no tables, or at start if only tables
+            if in_table:
+                # Insert before first table
+                for i, line in enumerate(new_lines):
+                    if line.strip().startswith("["):
+                        new_lines.insert(i, kv_line)
+                        key_updated = True
+                        break
+            else:
+                new_lines.append(kv_line)
+    else:
+        # Nested key (e.g., agent.default -> [agent] section)
+        section_name = parts[0]
+        section_header = f"[{section_name}]"
+        key_updated = False
+        in_target_section = False
+        found_section = False
+        section_end_idx = -1
+
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+
+            # Check if this is the target section header
+            if stripped == section_header or stripped.startswith(f"{section_header} #"):
+                in_target_section = True
+                found_section = True
+                new_lines.append(line)
+                i += 1
+                continue
+
+            # Check if entering a different section
+            if in_target_section and stripped.startswith("["):
+                if not key_updated:
+                    new_lines.append(kv_line)
+                    key_updated = True
+                in_target_section = False
+
+            # Check if this line sets the key
+            if in_target_section:
+                key_match = key_pattern.match(stripped)
+                if key_match:
+                    new_lines.append(kv_line)
+                    key_updated = True
+                    i += 1
+                    continue
+
+            new_lines.append(line)
+            i += 1
+
+        # If we were still in target section at EOF
+        if in_target_section and not key_updated:
+            new_lines.append(kv_line)
+            key_updated = True
+
+        # If section wasn't found, create it
+        if not found_section:
+            if content.strip():
+                new_lines.append("")
+            new_lines.append(section_header)
+            new_lines.append(kv_line)
+
+    # Build final content
+    final_content = "\n".join(new_lines)
+    if not final_content.endswith("\n"):
+        final_content += "\n"
+
+    # Write atomically
+    try:
+        dir_path = file_path.parent
+        if not dir_path.exists():
+            dir_path.mkdir(parents=True, mode=0o700)
+
+        _atomic_write(file_path, final_content, content)
+
+    except OSError as e:
+        print(f"Error: Cannot write file: {e}", file=sys.stderr)
+        return False
+
+    return True
+
+
+def unset_global_key(file_path: Path, key: str) -> bool:
+    """
+    Unset (remove) a global key from config atomically.
+
+    Supports dot notation for nested keys (e.g., agent.default).
+    If a section becomes empty, it is removed.
+
+    Args:
+        file_path: Path to the TOML config file
+        key: The key to unset
+
+    Returns:
+        True on success, False on failure
+    """
+    import re
+
+    if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_.]*$", key):
+        print(f"Error: Invalid key name: {key}", file=sys.stderr)
+        return False
+
+    parts = key.split(".")
+
+    try:
+        content = _read_config_text(file_path, missing=None)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error: Cannot read file: {e}", file=sys.stderr)
+        return False
+    if content is None:
+        return True  # Nothing to unset
+
+    lines = content.split("\n")
+    new_lines = []
+    # Pattern for a line assigning the key within its table (the last part
+    # of a dotted key), compiled once for the loop
+    key_pattern = re.compile(rf"^{re.escape(parts[-1])}\s*=")
+
+    if len(parts) == 1:
+        # Top-level key
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith("["):
+                new_lines.append(line)
+                continue
+            key_match = key_pattern.match(stripped)
+            if key_match:
+                continue  # Skip this line
+            new_lines.append(line)
+    else:
+        # Nested key
+        section_name = parts[0]
+        section_header = f"[{section_name}]"
+        in_target_section = False
+        section_start_idx = -1
+
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+
+            if stripped == section_header or stripped.startswith(f"{section_header} #"):
+                in_target_section = True
+                section_start_idx = len(new_lines)
+                new_lines.append(line)
+                i += 1
+                continue
+
+            if in_target_section and stripped.startswith("["):
+                in_target_section = False
+
+            if in_target_section:
+                key_match = key_pattern.match(stripped)
+                if key_match:
+                    i += 1
+                    continue  # Skip this line
+
+            new_lines.append(line)
+            i += 1
+
+        # Check if section is now empty
+        if section_start_idx >= 0:
+            has_content = False
+            section_end = len(new_lines)
+            for idx in range(section_start_idx + 1, section_end):
+                stripped = new_lines[idx].strip()
+                if stripped.startswith("["):
+                    section_end = idx
+                    break
+                if stripped and not stripped.startswith("#"):
+                    has_content = True
+                    break
+
+            if not has_content:
+                # Remove the section header and blank lines
+                del new_lines[section_start_idx:section_end]
+
+    # Build final content
+    final_content = "\n".join(new_lines)
+    if final_content and not final_content.endswith("\n"):
+        final_content += "\n"
+
+    # Write atomically
+    try:
+        _atomic_write(file_path, final_content, content)
+
+    except OSError as e:
+        print(f"Error: Cannot write file: {e}", file=sys.stderr)
+        return False
+
+    return True
+
+
+def set_workspace_key(file_path: Path, workspace_path: str, key: str, value: str) -> bool:
+    """
+    Set a key in a workspace section atomically.
+
+    This function reads the existing file, updates the workspace section,
+    and writes back atomically (temp file + rename). It preserves comments
+    and other sections in the file.
+
+    Args:
+        file_path: Path to the TOML config file
+        workspace_path: The workspace path (key for [workspace."path"] table)
+        key: The key to set within the workspace section
+        value: The value to set (string)
+
+    Returns:
+        True on success, False on failure (error printed to stderr)
+    """
+    import re
+
+    # Validate key name (alphanumeric, underscore, no injection)
+    if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", key):
+        print(f"Error: Invalid key name: {key}", file=sys.stderr)
+        return False
+
+    # Validate workspace path (must be absolute, no control characters)
+    if not workspace_path.startswith("/"):
+        print(f"Error: Workspace path must be absolute: {workspace_path}", file=sys.stderr)
+        return False
+    if "\0" in workspace_path:
+        print("Error: Workspace path contains null byte", file=sys.stderr)
+        return False
+    if "\n" in workspace_path or "\r" in workspace_path:
+        print("Error: Workspace path contains newline", file=sys.stderr)
+        return False
+
+    # Read existing file content (or start fresh)
+    try:
+        content = _read_config_text(file_path, missing="")
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error: Cannot read file: {e}", file=sys.stderr)
+        return False
+
+    # Build the workspace table header
+    # Use quoted key format for paths: [workspace."/path/to/dir"]
+    # Escape backslashes and quotes in the path for valid TOML
+    escaped_path = workspace_path.replace("\\", "\\\\").replace('"', '\\"')
+    ws_header = f'[workspace."{escaped_path}"]'
+
+    # Format the key-value line
+    kv_line = f"{key} = {format_toml_string(value)}"
+
+    # Find and update or insert the workspace section
+    # We need to be careful about preserving structure
+    lines = content.split("\n")
+    new_lines = []
+    in_target_workspace = False
+    found_workspace_section = False
+    key_updated = False
+    # Track position of last content line in workspace for proper insertion
+    last_content_pos_in_workspace = -1
+    i = 0
+
+    # Pattern for a line assigning the key, compiled once for the loop
+    key_pattern = re.compile(rf"^{re.escape(key)}\s*=")
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        # Check if this is the target workspace header
+        # Handle potential inline comments after header: [workspace."/path"] # comment
+        # Be careful: don't split on # inside quotes (path might contain #)
+        header_part = stripped
+        if stripped.startswith("[") and stripped.endswith("]"):
+            # Simple case: no inline comment
+            header_part = stripped
+        elif stripped.startswith("[") and "#" in stripped:
+            # Find the closing ] that ends the header, then check for # after
+            close_bracket = stripped.rfind("]")
+            if close_bracket > 0:
+                after_bracket = stripped[close_bracket + 1:].lstrip()
+                if after_bracket.startswith("#"):
+                    # There's a comment after the header
+                    header_part = stripped[:close_bracket + 1]
+        if header_part == ws_header:
+            in_target_workspace = True
+            found_workspace_section = True
+            new_lines.append(line)
+            last_content_pos_in_workspace = len(new_lines) - 1
+            i += 1
+            continue
+
+        # Check if we're entering a different section (ends current workspace)
+        # Only match actual table headers [xxx], not array of tables [[xxx]]
+        if in_target_workspace and stripped.startswith("["):
+            # Before leaving the section, add the key if not yet updated
+            if not key_updated:
+                # Insert after last content line in workspace
+                insert_pos = last_content_pos_in_workspace + 1
+                new_lines.insert(insert_pos, kv_line)
+                key_updated = True
+            in_target_workspace = False
+
+        # If we're in the target workspace section, look for the key
+        if in_target_workspace:
+            # Check if this line sets the target key
+            key_match = key_pattern.match(stripped)
+            if key_match:
+                # Replace the line with the new value
+                # Note: We do NOT preserve inline comments because properly detecting
+                # whether '#' is inside a quoted string requires a full TOML parser.
+                # A simple heuristic cannot reliably distinguish:
+                #   key = "value"  # real comment
+                #   key = '#not-a-comment'
+                # Dropping inline comments is the safe choice per TOML spec behavior.
+                new_lines.append(kv_line)
+                key_updated = True
+                # Update last content position
+                last_content_pos_in_workspace = len(new_lines) - 1
+                i += 1
+                continue
+            # Track non-blank lines as content
+            if stripped:
+                new_lines.append(line)
+                last_content_pos_in_workspace = len(new_lines) - 1
+            else:
+                new_lines.append(line)
+            i += 1
+            continue
+
+        new_lines.append(line)
+        i += 1
+
+    # If we were still in target workspace at EOF, add the key
+    if in_target_workspace and not key_updated:
+        # Insert after last content line
+        insert_pos = last_content_pos_in_workspace + 1
+        new_lines.insert(insert_pos, kv_line)
+        key_updated = True
+
+    # If workspace section wasn't found, create it
+    if not found_workspace_section:
+        # Add blank line before new section if file isn't empty
+        if content.strip():
+            new_lines.append("")
+        new_lines.append(ws_header)
+        new_lines.append(kv_line)
+        key_updated = True
+
+    # Build final content
+    final_content = "\n".join(new_lines)
+    # Ensure file ends with newline
+    if not final_content.endswith("\n"):
+        final_content += "\n"
+
+    # Write atomically: temp file in same directory, then rename
+    # Using same directory ensures rename is atomic (same filesystem)
+    try:
+        dir_path = file_path.parent
+        # Create parent directories if needed with secure permissions
+        if not dir_path.exists():
+            dir_path.mkdir(parents=True, mode=0o700)
+        elif dir_path.is_file():
+            print(f"Error: Config directory is a file: {dir_path}", file=sys.stderr)
+            return False
+
+        _atomic_write(file_path, final_content, content)
+
+    except OSError as e:
+        print(f"Error: Cannot write file: {e}", file=sys.stderr)
+        return False
+    except Exception as e:
+        print(f"Error: Unexpected error writing file: {e}", file=sys.stderr)
+        return False
+
+    return True
+
+
+def validate_agent_section(config: dict, source_file: str) -> dict | None:
+    """
+    Validate and extract the [agent] section from a manifest config.
+
+    Args:
+        config: The parsed TOML config dict
+        source_file: The source file path (for error messages and output)
+
+    Returns:
+        Validated agent config dict with fields:
+        - name: str (required)
+        - binary: str (required)
+        - default_args: list[str] (required, can be empty)
+        - aliases: list[str] (optional, defaults to [])
+        - optional: bool (optional, defaults to False)
+        - source_file: str (the source file path)
+        Returns None if [agent] section is missing.
+
+    Raises:
+        SystemExit: If validation fails for required fields or types
+    """
+    agent_section = config.get("agent")
+
+    # Missing [agent] section - return None (not error)
+    if agent_section is None:
+        return None
+
+    # [agent] exists but is not a dict - error
+    if not isinstance(agent_section, dict):
+        print(f"Error: [agent] section must be a table/dict in {source_file}", file=sys.stderr)
+        sys.exit(1)
+
+    result = {"source_file": source_file}
+
+    # Validate 'name' - required, must be string
+    name = agent_section.get("name")
+    if name is None:
+        print(f"Error: [agent].name is required in {source_file}", file=sys.stderr)
+        sys.exit(1)
+    if not isinstance(name, str):
+        print(
+            f"Error: [agent].name must be a string, got {type(name).__name__} in {source_file}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    if not name:
+        print(f"Error: [agent].name cannot be empty in {source_file}", file=sys.stderr)
+        sys.exit(1)
+    result["name"] = name
+
+    # Validate 'binary' - required, must be string
+    binary = agent_section.get("binary")
+    if binary is None:
+        print(f"Error: [agent].binary is required in {source_file}", file=sys.stderr)
+        sys.exit(1)
+    if not isinstance(binary, str):
+        print(
+            f"Error: [agent].binary must be a string, got {type(binary).__name__} in {source_file}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    if not binary:
+        print(f"Error: [agent].binary cannot be empty in {source_file}", file=sys.stderr)
+        sys.exit(1)
+    result["binary"] = binary
+
+    # Validate 'default_args' - optional, must be list of strings if present, defaults to []
+    # Per spec: wrappers only generated when non-empty, so missing = no wrapper (same as empty)
+    default_args = agent_section.get("default_args", [])
+    if not isinstance(default_args, list):
+        print(
+            f"Error: [agent].default_args must be a list, got {type(default_args).__name__} in {source_file}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    # Validate each item is a string
+    validated_args = []
+    for i, item in enumerate(default_args):
+        if not isinstance(item, str):
+            print(
+                f"Error: [agent].default_args[{i}] must be a string, got {type(item).__name__} in {source_file}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        validated_args.append(item)
+    result["default_args"] = validated_args
+
+    # Validate 'aliases' - optional, must be list of strings, defaults to []
+    aliases = agent_section.get("aliases", [])
+    if not isinstance(aliases, list):
+        print(
+            f"Error: [agent].aliases must be a list, got {type(aliases).__name__} in {source_file}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    validated_aliases = []
+    for i, item in enumerate(aliases):
+        if not isinstance(item, str):
+            print(
+                f"Error: [agent].aliases[{i}] must be a string, got {type(item).__name__} in {source_file}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        if not item:
+            print(f"Error: [agent].aliases[{i}] cannot be empty in {source_file}", file=sys.stderr)
+            sys.exit(1)
+        validated_aliases.append(item)
+    result["aliases"] = validated_aliases
+
+    # Validate 'optional' - optional, must be boolean, defaults to False
+    optional = agent_section.get("optional", False)
+    if not isinstance(optional, bool):
+        print(
+            f"Error: [agent].optional must be a boolean, got {type(optional).__name__} in {source_file}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    result["optional"] = optional
+
+    return result
+
+
+# Parser built by build_parser(); --serve reuses it across requests
+_PARSER = None
+
+
+def build_parser():
+    """Build the argparse parser once (imported lazily, see parse_args)."""
+    global _PARSER
+
+    if _PARSER is not None:
+        return _PARSER
+
+    import argparse
+
+    class ErrorExitParser(argparse.ArgumentParser):
+        """ArgumentParser that exits with code 1 on errors (not 2)."""
+
+        def error(self, message: str) -> None:
+            """Print error message and exit with code 1."""
+            self.print_usage(sys.stderr)
+            print(f"{self.prog}: error: {message}", file=sys.stderr)
+            sys.exit(1)
+
+    parser = ErrorExitParser(
+        description="Parse ContainAI TOML config file for shell consumption"
+    )
+    parser.add_argument(
+        "--file",
+        "-f",
+        help="Path to TOML config file (required except with --serve)",
+    )
+    parser.add_argument(
+        "--key",
+        "-k",
+        help="Dot-separated key path to retrieve (e.g., agent.data_volume)",
+    )
+    parser.add_argument(
+        "--json",
+        "-j",
+        action="store_true",
+        dest="output_json",
+        help="Output entire config as JSON (compact format)",
+    )
+    parser.add_argument(
+        "--exists",
+        "-e",
+        help="Check if key exists (exit 0 if exists, 1 if not)",
+    )
+    parser.add_argument(
+        "--env",
+        action="store_true",
+        help="Extract and validate [env] section (output as JSON, null if missing)",
+    )
+    parser.add_argument(
+        "--set-workspace-key",
+        nargs=3,
+        metavar=("PATH", "KEY", "VALUE"),
+        help="Set a key in workspace section: --set-workspace-key /path key value",
+    )
+    parser.add_argument(
+        "--get-workspace",
+        metavar="PATH",
+        help="Get workspace state for path (output as JSON)",
+    )
+    parser.add_argument(
+        "--unset-workspace-key",
+        nargs=2,
+        metavar=("PATH", "KEY"),
+        help="Unset a key in workspace section: --unset-workspace-key /path key",
+    )
+    parser.add_argument(
+        "--set-key",
+        nargs=2,
+        metavar=("KEY", "VALUE"),
+        help="Set a global key: --set-key key value",
+    )
+    parser.add_argument(
+        "--unset-key",
+        metavar="KEY",
+        help="Unset a global key: --unset-key key",
+    )
+    parser.add_argument(
+        "--emit-agents",
+        action="store_true",
+        help="Extract and validate [agent] section from manifest file (output as JSON, null if missing)",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="Answer requests on a Unix socket until terminated (see serve())",
+    )
+
+    _PARSER = parser
+    return parser
+
+
+# Options recognized without argparse: option -> (dest, nargs), where nargs 0
+# is a store_true flag. Must stay in sync with build_parser().
+_ARGV_OPTIONS = {
+    "--file": ("file", 1),
+    "-f": ("file", 1),
+    "--key": ("key", 1),
+    "-k": ("key", 1),
+    "--json": ("output_json", 0),
+    "-j": ("output_json", 0),
+    "--exists": ("exists", 1),
+    "-e": ("exists", 1),
+    "--env": ("env", 0),
+    "--set-workspace-key": ("set_workspace_key", 3),
+    "--get-workspace": ("get_workspace", 1),
+    "--unset-workspace-key": ("unset_workspace_key", 2),
+    "--set-key": ("set_key", 2),
+    "--unset-key": ("unset_key", 1),
+    "--emit-agents": ("emit_agents", 0),
+    "--serve": ("serve", 1),
+}
+
+
+def _parse_argv_fast(argv: list[str]) -> dict | None:
+    """
+    Parse the plain `--opt value ...` form used by the shell callers.
+
+    Returns the argparse-equivalent attribute dict, or None when argv holds
+    anything argparse should handle itself: help, unknown or abbreviated
+    options, `--opt=value`, values starting with "-", missing values, or a
+    missing --file (outside --serve).
+    """
+    values = {
+        "file": None,
+        "key": None,
+        "output_json": False,
+        "exists": None,
+        "env": False,
+        "set_workspace_key": None,
+        "get_workspace": None,
+        "unset_workspace_key": None,
+        "set_key": None,
+        "unset_key": None,
+        "emit_agents": False,
+        "serve": None,
+    }
+    i = 0
+    while i < len(argv):
+        option = _ARGV_OPTIONS.get(argv[i])
+        if option is None:
+            return None
+        dest, nargs = option
+        args = argv[i + 1 : i + 1 + nargs]
+        if len(args) < nargs or any(arg.startswith("-") for arg in args):
+            return None
+        if nargs == 0:
+            values[dest] = True
+        elif nargs == 1:
+            values[dest] = args[0]
+        else:
+            values[dest] = args
+        i += 1 + nargs
+    if values["file"] is None and values["serve"] is None:
+        return None
+    return values
+
+
+def parse_args(argv: list[str]):
+    """
+    Parse command line arguments.
+
+    The option forms the shell scripts use are recognized directly, avoiding
+    argparse's import and setup cost. Anything else, including help and
+    usage errors, goes through argparse.
+    """
+    values = _parse_argv_fast(argv)
+    if values is not None:
+        from types import SimpleNamespace
+
+        return SimpleNamespace(**values)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # --file is required for every mode except --serve
+    if args.file is None and args.serve is None:
+        parser.error("the following arguments are required: --file/-f")
+    return args
+
+
+# orjson (optional) encodes JSON ~10x faster than the json module, but it
+# takes several ms longer to import, so a one-shot run only comes out ahead
+# when dumping a large config
+_ORJSON_MIN_BYTES = 256 * 1024
+
+# Set by serve(): a long-lived process pays the orjson import once, so all
+# of its float-free JSON output goes through orjson (see _json_encode)
+_PREFER_ORJSON = False
+
+
+def _escape_non_ascii(match) -> str:
+    """Spell one non-ASCII (or DEL) character the way json's ensure_ascii does."""
+    code = ord(match.group())
+    if code < 0x10000:
+        return f"\\u{code:04x}"
+    code -= 0x10000
+    return f"\\u{0xD800 | (code >> 10):04x}\\u{0xDC00 | (code & 0x3FF):04x}"
+
+
+def _contains_float(obj) -> bool:
+    """Return True if obj, or any list item or dict value inside it, is a float."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            return True
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def _json_encode(obj, default=None, use_orjson: bool = False) -> bytes:
+    """
+    Serialize obj as compact, ASCII-only JSON bytes.
+
+    With use_orjson, orjson is tried first when installed and its output is
+    brought in line with the json module: datetimes are routed through
+    `default` as json does and non-ASCII text is escaped as ensure_ascii
+    would. orjson spells floats differently (0.00005 for 5e-05, 1e-6 for
+    1e-06, null for NaN), so anything containing a float is encoded by
+    json instead, keeping output byte-for-byte identical. Encoding errors
+    are always reported by json.
+    """
+    if use_orjson and not _contains_float(obj):
+        try:
+            import orjson
+        except ImportError:
+            pass
+        else:
+            try:
+                out = orjson.dumps(
+                    obj, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME
+                )
+            except TypeError:  # orjson.JSONEncodeError; let json report it
+                out = None
+            if out is not None:
+                if out.isascii() and b"\x7f" not in out:
+                    return out
+                import re
+
+                # These bytes only occur inside JSON strings
+                return re.sub(
+                    r"[^\x00-\x7e]", _escape_non_ascii, out.decode("utf-8")
+                ).encode("ascii")
+
+    import json
+
+    return json.dumps(obj, separators=(",", ":"), default=default).encode("ascii")
+
+
+def _json_dumps(obj, default=None, use_orjson: bool = False) -> str:
+    """Serialize obj like _json_encode, returning str."""
+    return _json_encode(obj, default=default, use_orjson=use_orjson).decode("ascii")
+
+
+def _write_stdout(data: str | bytes) -> None:
+    """
+    Write one line of output as UTF-8 bytes, bypassing the text layer.
+
+    Output is consumed by shell command substitution; skipping the
+    TextIOWrapper saves a codec pass per call. TOML text is always UTF-8
+    so the result does not depend on the caller's locale. Bytes (encoded
+    JSON) are written as-is.
+    """
+    if type(data) is str:
+        data = data.encode("utf-8")
+    sys.stdout.buffer.write(data + b"\n")
+
+
+# Serve mode: a long-lived process answers parse-toml.py invocations over a
+# Unix socket so batch callers skip interpreter startup and imports. Shell
+# clients cannot build JSON safely, so the framing is NUL-separated:
+#
+#   request:  cwd \0 arg1 \0 arg2 \0 ...      (client then shuts down writes)
+#   response: exit_code \0 stdout \0 stderr \0
+#
+# Each request runs main() in-process with the given arguments, so output and
+# exit codes are identical to running parse-toml.py directly in cwd. (JSON is
+# encoded by orjson here, but _json_encode keeps it byte-identical to json's.)
+_SERVE_MAX_REQUEST = 64 * 1024
+_SERVE_TIMEOUT = 5.0
+
+
+class _ServeTerminated(BaseException):
+    """
+    Raised by serve()'s SIGTERM handler.
+
+    Not a SystemExit (nor an Exception), so _run_request cannot mistake it
+    for main() exiting and answer the client with a bogus exit code.
+    """
+
+
+def _raise_serve_terminated(signum, frame) -> None:
+    raise _ServeTerminated
+
+
+def _run_request(cwd: str, argv: list[str]) -> tuple[int, bytes, bytes]:
+    """Run main(argv) in cwd, capturing its exit code, stdout and stderr."""
+    import io
+
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    stderr = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        os.chdir(cwd)
+        if "--serve" in argv:
+            print("Error: --serve cannot be requested from a server", file=sys.stderr)
+            code = 1
+        else:
+            main(argv)
+            code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        sys.stdout, sys.stderr = saved
+    stdout.flush()
+    stderr.flush()
+    return code, stdout.buffer.getvalue(), stderr.buffer.getvalue()
+
+
+def _handle_connection(conn) -> None:
+    """Read one NUL-framed request from conn and send the framed response."""
+    conn.settimeout(_SERVE_TIMEOUT)
+    chunks = []
+    size = 0
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > _SERVE_MAX_REQUEST:
+            return
+        chunks.append(chunk)
+    fields = [os.fsdecode(field) for field in b"".join(chunks).split(b"\0")]
+    if fields and fields[-1] == "":
+        fields.pop()  # Terminator of the last field
+    if not fields:
+        return
+    code, out, err = _run_request(fields[0], fields[1:])
+    # NUL is the frame separator; bash would drop it from $(...) output anyway
+    out = out.replace(b"\0", b"")
+    err = err.replace(b"\0", b"")
+    conn.sendall(b"%d\0%s\0%s\0" % (code, out, err))
+
+
+def serve(socket_path: str) -> None:
+    """
+    Answer parse-toml.py requests on a Unix socket until terminated.
+
+    The socket is created with mode 0600. A stale socket left by a dead
+    server is replaced; a live one is an error. Requests are handled one at
+    a time. The socket is removed on SIGTERM/SIGINT.
+    """
+    global _PREFER_ORJSON
+
+    import signal
+    import socket
+
+    _PREFER_ORJSON = True
+
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(st.st_mode):
+            print(f"Error: Not a socket: {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)  # Stale socket from a dead server
+        else:
+            print(f"Error: Already serving on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            probe.close()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    except OSError as e:
+        print(f"Error: Cannot bind {socket_path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        os.umask(old_umask)
+    bound = os.stat(socket_path)
+    server.listen(16)
+
+    signal.signal(signal.SIGTERM, _raise_serve_terminated)
+    cwd = os.getcwd()
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    _handle_connection(conn)
+                except OSError:
+                    pass  # Client went away or timed out
+                finally:
+                    os.chdir(cwd)
+    except (KeyboardInterrupt, _ServeTerminated):
+        pass  # Any request in progress is dropped without a response
+    finally:
+        server.close()
+        try:
+            # Only remove the socket if it is still ours
+            st = os.stat(socket_path)
+            if (st.st_dev, st.st_ino) == (bound.st_dev, bound.st_ino):
+                os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Validate mutually exclusive options (all modes including write)
+    # Use 'is not None' to correctly handle empty string keys
+    # Plain bool addition: no list is built just to be summed
+    mode_count = (
+        (args.key is not None)
+        + args.output_json
+        + (args.exists is not None)
+        + args.env
+        + (args.get_workspace is not None)
+        + (args.set_workspace_key is not None)
+        + (args.unset_workspace_key is not None)
+        + (args.set_key is not None)
+        + (args.unset_key is not None)
+        + args.emit_agents
+        + (args.serve is not None)
+    )
+    if mode_count == 0:
+        print(
+            "Error: Must specify one of --key, --json, --exists, --env, --get-workspace, --set-workspace-key, --unset-workspace-key, --set-key, --unset-key, --emit-agents, or --serve",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    if mode_count > 1:
+        print(
+            "Error: Options are mutually exclusive",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    # Handle --serve mode (runs until terminated)
+    if args.serve is not None:
+        serve(args.serve)
+        sys.exit(0)
+
+    # Handle write modes (do not require loading file)
+    if args.set_workspace_key or args.unset_workspace_key or args.set_key or args.unset_key:
+        from pathlib import Path
+
+        config_path = Path(args.file)
+
+        # Handle --set-workspace-key mode
+        if args.set_workspace_key:
+            ws_path, ws_key, ws_value = args.set_workspace_key
+            if set_workspace_key(config_path, ws_path, ws_key, ws_value):
+                sys.exit(0)
+            else:
+                sys.exit(1)
+
+        # Handle --unset-workspace-key mode
+        if args.unset_workspace_key:
+            ws_path, ws_key = args.unset_workspace_key
+            if unset_workspace_key(config_path, ws_path, ws_key):
+                sys.exit(0)
+            else:
+                sys.exit(1)
+
+        # Handle --set-key mode
+        if args.set_key:
+            g_key, g_value = args.set_key
+            if set_global_key(config_path, g_key, g_value):
+                sys.exit(0)
+            else:
+                sys.exit(1)
+
+        # Handle --unset-key mode
+        if unset_global_key(config_path, args.unset_key):
+            sys.exit(0)
+        else:
+            sys.exit(1)
+
+    # Load the TOML file for read operations
+    # For --get-workspace, missing file means empty workspace state
+    config = _load_or_die(
+        args.file, missing={} if args.get_workspace is not None else _NOT_FOUND
+    )
+
+    # Handle --key mode
+    if args.key is not None:
+        value = get_nested_value(config, args.key)
+        # Missing key outputs empty (no newline) and exits 0 (per spec)
+        if value is not _NOT_FOUND:
+            _write_stdout(format_value(value))
+        sys.exit(0)
+
+    # Handle --exists mode
+    if args.exists is not None:
+        value = get_nested_value(config, args.exists)
+        if value is not _NOT_FOUND:
+            sys.exit(0)
+        else:
+            sys.exit(1)
+
+    # Remaining modes output JSON
+    # Handle --get-workspace mode
+    if args.get_workspace is not None:
+        ws_state = get_workspace_state(config, args.get_workspace)
+        try:
+            _write_stdout(_json_encode(ws_state, use_orjson=_PREFER_ORJSON))
+        except Exception as e:
+            print(f"Error: Cannot serialize workspace state: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    # Handle --env mode (extract and validate [env] section)
+    if args.env:
+        env_config = validate_env_section(config)
+        # Output as JSON: validated dict or null if section missing
+        try:
+            _write_stdout(_json_encode(env_config, use_orjson=_PREFER_ORJSON))
+        except Exception as e:
+            print(f"Error: Cannot serialize env config: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    # Handle --emit-agents mode (extract and validate [agent] section)
+    if args.emit_agents:
+        agent_config = validate_agent_section(config, args.file)
+        # Output as JSON: validated dict or null if section missing
+        try:
+            _write_stdout(_json_encode(agent_config, use_orjson=_PREFER_ORJSON))
+        except Exception as e:
+            print(f"Error: Cannot serialize agent config: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    # Handle --json mode (compact format for shell consumption)
+    if args.output_json:
+        use_orjson = _PREFER_ORJSON
+        if not use_orjson:
+            try:
+                use_orjson = os.stat(args.file).st_size >= _ORJSON_MIN_BYTES
+            except OSError:
+                pass
+        try:
+            _write_stdout(_json_encode(config, default=str, use_orjson=use_orjson))
+        except Exception as e:
+            print(f"Error: Cannot serialize config: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@
 # Provides:
 #   _containai_find_config        - Find config file by walking up from workspace
 #   _containai_parse_config       - Parse config file via parse-toml.py
+#   _containai_parse_toml         - Run parse-toml.py (via --serve socket if set)
 #   _containai_resolve_volume     - Resolve data volume with precedence
 #   _containai_resolve_excludes   - Resolve cumulative excludes from config
 #   _containai_resolve_agent      - Resolve agent from config
@@ -155,6 +156,38 @@ _containai_find_config() {
     return 0
 }
 
+# ==============================================================================
+# parse-toml.py invocation
+# ==============================================================================
+
+# Run parse-toml.py, through a `parse-toml.py --serve` process when available
+# Uses the server when CONTAINAI_TOML_SOCKET names a socket and socat is
+# installed; otherwise, or if the server does not answer, runs python3 directly.
+# Arguments: $1 = directory containing parse-toml.py, remaining = its arguments
+# Outputs: parse-toml.py stdout and stderr
+# Returns: parse-toml.py exit code
+_containai_parse_toml() {
+    local script_dir="$1"
+    shift
+    local socket_path="${CONTAINAI_TOML_SOCKET:-}"
+    local rc out err
+
+    if [[ -n "$socket_path" ]] && [[ -S "$socket_path" ]] && command -v socat >/dev/null 2>&1; then
+        # Request: NUL-terminated cwd and arguments
+        # Response: NUL-terminated exit code, stdout, stderr
+        if {
+            IFS= read -r -d '' rc && IFS= read -r -d '' out && IFS= read -r -d '' err
+        } < <(printf '%s\0' "$PWD" "$@" | socat -t 10 - "UNIX-CONNECT:$socket_path" 2>/dev/null) &&
+            [[ "$rc" =~ ^[0-9]+$ ]]; then
+            printf '%s' "$out"
+            printf '%s' "$err" >&2
+            return "$rc"
+        fi
+    fi
+
+    python3 "$script_dir/parse-toml.py" "$@"
+}
+
 # ==============================================================================
 # Workspace matching
 # ==============================================================================
@@ -168,40 +201,46 @@ _containai_find_matching_workspace() {
 
     python3 -c "
 import json
+import os
 import sys
-from pathlib import Path
+
+def resolved_parts(path):
+    # realpath() is what Path.resolve() does underneath; splitting the
+    # string ourselves avoids building a Path object per section
+    path = os.path.realpath(path)
+    return path.split('/') if path != '/' else ['']
 
 config = json.load(sys.stdin)
-workspace = Path(sys.argv[1]).resolve()
+workspace_parts = resolved_parts(sys.argv[1])
 
 workspaces = config.get('workspace', {})
 if not isinstance(workspaces, dict):
     sys.exit(0)
 
-best_match = None
-best_segments = 0
-
+# Segment trie: each node maps path part -> child node, and the None
+# slot holds the workspace key ending there (first key wins on ties)
+trie = {}
 for path_str, section in workspaces.items():
     if not isinstance(section, dict):
         continue
 
-    cfg_path = Path(path_str)
-
     # Skip relative paths (absolute only)
-    if not cfg_path.is_absolute():
+    if not os.path.isabs(path_str):
         continue
 
-    cfg_path = cfg_path.resolve()
+    node = trie
+    for part in resolved_parts(path_str):
+        node = node.setdefault(part, {})
+    node.setdefault(None, path_str)
 
-    # Check if workspace is under cfg_path
-    try:
-        workspace.relative_to(cfg_path)
-        num_segments = len(cfg_path.parts)
-        if num_segments > best_segments:
-            best_match = path_str
-            best_segments = num_segments
-    except ValueError:
-        pass
+# Walk the workspace path; the deepest keyed node is the longest prefix
+best_match = None
+node = trie
+for part in workspace_parts:
+    node = node.get(part)
+    if node is None:
+        break
+    best_match = node.get(None, best_match)
 
 if best_match:
     print(best_match)
@@ -282,7 +321,7 @@ _containai_parse_config() {
 
     # Call parse-toml.py --json to get full config (compact JSON for shell safety)
     if [[ -n "$parse_stderr" ]]; then
-        if ! config_json=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --json 2>"$parse_stderr"); then
+        if ! config_json=$(_containai_parse_toml "$script_dir" --file "$config_file" --json 2>"$parse_stderr"); then
             if [[ "$strict" == "strict" ]]; then
                 echo "[ERROR] Failed to parse config file: $config_file" >&2
             else
@@ -306,7 +345,7 @@ _containai_parse_config() {
     else
         # No temp file available, let stderr pass through to parent stderr
         # DO NOT use 2>&1 - that would capture stderr into config_json and corrupt JSON
-        if ! config_json=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --json); then
+        if ! config_json=$(_containai_parse_toml "$script_dir" --file "$config_file" --json); then
             if [[ "$strict" == "strict" ]]; then
                 echo "[ERROR] Failed to parse config file: $config_file" >&2
                 return 1
@@ -575,14 +614,14 @@ if ws_key:
     if not isinstance(ws_excludes, list):
         ws_excludes = []
 
-# Dedupe preserving order
-seen = {}
-for item in default_excludes + ws_excludes:
-    if isinstance(item, str) and item not in seen:
-        # Skip multi-line values (security/safety)
-        if '\n' not in item and '\r' not in item:
-            seen[item] = True
-            print(item)
+# Dedupe preserving order; dict.fromkeys does the dedupe in C
+# Skip multi-line values (security/safety)
+excludes = dict.fromkeys(
+    item for item in default_excludes + ws_excludes
+    if isinstance(item, str) and '\n' not in item and '\r' not in item
+)
+if excludes:
+    print('\n'.join(excludes))
 " "$ws_key")
 
     # Parse excludes into array
@@ -1170,7 +1209,7 @@ _containai_resolve_env_config() {
     # The script handles validation and returns JSON (or null if [env] missing)
     # IMPORTANT: Do NOT use 2>&1 - that would capture stderr into env_json and corrupt JSON
     # Let stderr from parse-toml.py (warnings) pass through to parent stderr
-    if ! env_json=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --env); then
+    if ! env_json=$(_containai_parse_toml "$script_dir" --file "$config_file" --env); then
         # Parse failed - check if strict mode applies
         if [[ -n "$explicit_config" ]]; then
             printf '%s\n' "[ERROR] Failed to parse config file: $config_file" >&2
@@ -1270,7 +1309,7 @@ _containai_resolve_import_exclude_priv() {
     fi
 
     # Parse config and extract import.exclude_priv
-    if ! config_json=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --json 2>/dev/null); then
+    if ! config_json=$(_containai_parse_toml "$script_dir" --file "$config_file" --json 2>/dev/null); then
         printf '%s' "true"
         return 0
     fi
@@ -1378,13 +1417,13 @@ _containai_resolve_import_additional_paths() {
     local config_json parse_stderr
     if [[ -n "$explicit_config" ]]; then
         # Explicit config: let parse errors through to stderr
-        if ! config_json=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --json); then
+        if ! config_json=$(_containai_parse_toml "$script_dir" --file "$config_file" --json); then
             printf '%s\n' "[ERROR] Failed to parse config file: $config_file" >&2
             return 1
         fi
     else
         # Discovered config: suppress stderr, warn on failure
-        if ! config_json=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --json 2>/dev/null); then
+        if ! config_json=$(_containai_parse_toml "$script_dir" --file "$config_file" --json 2>/dev/null); then
             printf '%s\n' "[WARN] Failed to parse config file: $config_file" >&2
             return 0
         fi
@@ -1646,7 +1685,7 @@ _containai_read_workspace_state() {
     # Call parse-toml.py --get-workspace
     # This returns {} for missing file or missing workspace (not an error)
     local ws_json
-    if ! ws_json=$(python3 "$script_dir/parse-toml.py" --file "$user_config" --get-workspace "$normalized_path" 2>/dev/null); then
+    if ! ws_json=$(_containai_parse_toml "$script_dir" --file "$user_config" --get-workspace "$normalized_path" 2>/dev/null); then
         # Parse error - return empty (graceful degradation)
         printf '%s' "{}"
         return 0
@@ -1704,7 +1743,7 @@ _containai_write_workspace_state() {
 
     # Call parse-toml.py --set-workspace-key
     # This creates the file and directory if needed
-    if ! python3 "$script_dir/parse-toml.py" --file "$user_config" --set-workspace-key "$normalized_path" "$key" "$value"; then
+    if ! _containai_parse_toml "$script_dir" --file "$user_config" --set-workspace-key "$normalized_path" "$key" "$value"; then
         printf '%s\n' "[ERROR] Failed to write workspace state" >&2
         return 1
     fi
@@ -1974,48 +2013,53 @@ _containai_resolve_with_source() {
         # Read from user config workspace section with longest-prefix matching
         user_config_file=$(_containai_user_config_path)
         if [[ -f "$user_config_file" ]]; then
-            if config_json=$(python3 "$script_dir/parse-toml.py" --file "$user_config_file" --json 2>/dev/null); then
+            if config_json=$(_containai_parse_toml "$script_dir" --file "$user_config_file" --json 2>/dev/null); then
                 # Find best matching workspace and get the key value
                 local ws_result
                 ws_result=$(printf '%s' "$config_json" | python3 -c "
 import json, sys
-from pathlib import Path
+
+def lexical_path(path):
+    # Same cleanup Path() does: drop empty and '.' segments, keeping a
+    # POSIX '//' root distinct. Returns the cleaned path and its segment
+    # count (root counts as one).
+    root = '//' if path[:2] == '//' and path[2:3] != '/' else '/'
+    parts = [p for p in path.split('/') if p and p != '.']
+    return root + '/'.join(parts), len(parts) + 1
 
 config = json.load(sys.stdin)
 workspace = sys.argv[1]
 key = sys.argv[2]
 
 workspaces = config.get('workspace', {})
-if not isinstance(workspaces, dict):
+if not isinstance(workspaces, dict) or not workspace.startswith('/'):
     sys.exit(0)
 
-# Find longest-prefix matching workspace
-best_match_path = None
-best_match_value = None
-best_segments = 0
-ws_path = Path(workspace)
-
+# Find longest-prefix matching workspace: try candidates deepest first
+# (stable sort keeps config order on ties) and stop at the first match
+ws_path, _ = lexical_path(workspace)
+candidates = []
 for path_str, section in workspaces.items():
-    if not isinstance(section, dict):
+    if not isinstance(section, dict) or not path_str.startswith('/'):
         continue
-    try:
-        cfg_path = Path(path_str)
-        if not cfg_path.is_absolute():
-            continue
-        ws_path.relative_to(cfg_path)
-        num_segments = len(cfg_path.parts)
-        if num_segments > best_segments:
-            val = section.get(key, '')
-            if val is not None and val != '':
-                best_match_path = path_str
-                best_match_value = val
-                best_segments = num_segments
-    except ValueError:
-        pass
+    cfg_path, num_segments = lexical_path(path_str)
+    candidates.append((num_segments, cfg_path, path_str, section))
+candidates.sort(key=lambda candidate: -candidate[0])
 
-if best_match_value:
-    # Output: value<TAB>path
-    print(f'{best_match_value}\t{best_match_path}', end='')
+for _, cfg_path, path_str, section in candidates:
+    if not ws_path.startswith(cfg_path):
+        continue
+    # Segment boundary: look at the next char instead of slicing off the
+    # remainder. A root ('/' or '//') must not be followed by another '/'.
+    boundary = ws_path[len(cfg_path):len(cfg_path) + 1]
+    if boundary and (boundary == '/') == cfg_path.endswith('/'):
+        continue
+    val = section.get(key, '')
+    if val is not None and val != '':
+        if val:
+            # Output: value<TAB>path
+            print(f'{val}\t{path_str}', end='')
+        break
 " "$normalized_path" "$key" 2>/dev/null)
                 if [[ -n "$ws_result" ]]; then
                     value="${ws_result%%	*}"
@@ -2030,41 +2074,49 @@ if best_match_value:
     # 4. Repo-local config (.containai/config.toml)
     # Use the repo_config_file found earlier (if any)
     if [[ "$python_available" == "true" ]] && [[ "$repo_local_found" == "true" ]] && [[ -n "$repo_config_file" ]]; then
-        if config_json=$(python3 "$script_dir/parse-toml.py" --file "$repo_config_file" --json 2>/dev/null); then
+        if config_json=$(_containai_parse_toml "$script_dir" --file "$repo_config_file" --json 2>/dev/null); then
             # For data_volume, check workspace section and agent.data_volume
             # (matches _containai_parse_config fallback chain)
             if [[ "$key" == "data_volume" ]]; then
                 value=$(printf '%s' "$config_json" | python3 -c "
 import json, sys
-from pathlib import Path
+
+def lexical_path(path):
+    # Same cleanup Path() does: drop empty and '.' segments, keeping a
+    # POSIX '//' root distinct. Returns the cleaned path and its segment
+    # count (root counts as one).
+    root = '//' if path[:2] == '//' and path[2:3] != '/' else '/'
+    parts = [p for p in path.split('/') if p and p != '.']
+    return root + '/'.join(parts), len(parts) + 1
+
 config = json.load(sys.stdin)
 workspace = sys.argv[1]
 
-# 1. Try workspace.<path>.data_volume (longest prefix match)
+# 1. Try workspace.<path>.data_volume (longest prefix match): try candidates
+# deepest first (stable sort keeps config order on ties), first match wins
 workspaces = config.get('workspace', {})
-best_match = None
-best_segments = 0
-if isinstance(workspaces, dict):
-    ws_path = Path(workspace)
+if isinstance(workspaces, dict) and workspace.startswith('/'):
+    ws_path, _ = lexical_path(workspace)
+    candidates = []
     for path_str, section in workspaces.items():
-        if not isinstance(section, dict):
+        if not isinstance(section, dict) or not path_str.startswith('/'):
             continue
-        try:
-            cfg_path = Path(path_str)
-            if not cfg_path.is_absolute():
-                continue
-            ws_path.relative_to(cfg_path)
-            num_segments = len(cfg_path.parts)
-            if num_segments > best_segments:
-                vol = section.get('data_volume', '')
-                if vol:
-                    best_match = vol
-                    best_segments = num_segments
-        except ValueError:
-            pass
-if best_match:
-    print(best_match, end='')
-    sys.exit(0)
+        cfg_path, num_segments = lexical_path(path_str)
+        candidates.append((num_segments, cfg_path, section))
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    for _, cfg_path, section in candidates:
+        if not ws_path.startswith(cfg_path):
+            continue
+        # Segment boundary: look at the next char instead of slicing off the
+        # remainder. A root ('/' or '//') must not be followed by another '/'.
+        boundary = ws_path[len(cfg_path):len(cfg_path) + 1]
+        if boundary and (boundary == '/') == cfg_path.endswith('/'):
+            continue
+        vol = section.get('data_volume', '')
+        if vol:
+            print(vol, end='')
+            sys.exit(0)
 
 # 2. Try agent.data_volume
 agent = config.get('agent', {})
@@ -2108,7 +2160,7 @@ if current is not None and current != '':
     if [[ "$python_available" == "true" ]] && [[ "$repo_local_found" == "false" ]]; then
         user_config_file=$(_containai_user_config_path)
         if [[ -f "$user_config_file" ]]; then
-            if config_json=$(python3 "$script_dir/parse-toml.py" --file "$user_config_file" --json 2>/dev/null); then
+            if config_json=$(_containai_parse_toml "$script_dir" --file "$user_config_file" --json 2>/dev/null); then
                 # For data_volume, also check agent.data_volume (matches _containai_parse_config)
                 if [[ "$key" == "data_volume" ]]; then
                     value=$(printf '%s' "$config_json" | python3 -c "
@@ -2257,7 +2309,7 @@ _containai_unset_workspace_key() {
     fi
 
     # Call parse-toml.py --unset-workspace-key
-    if ! python3 "$script_dir/parse-toml.py" --file "$user_config" --unset-workspace-key "$normalized_path" "$key"; then
+    if ! _containai_parse_toml "$script_dir" --file "$user_config" --unset-workspace-key "$normalized_path" "$key"; then
         printf '%s\n' "[ERROR] Failed to unset workspace key" >&2
         return 1
     fi
@@ -2293,7 +2345,7 @@ _containai_unset_global_key() {
     fi
 
     # Call parse-toml.py --unset-key
-    if ! python3 "$script_dir/parse-toml.py" --file "$user_config" --unset-key "$key"; then
+    if ! _containai_parse_toml "$script_dir" --file "$user_config" --unset-key "$key"; then
         printf '%s\n' "[ERROR] Failed to unset global key" >&2
         return 1
     fi
@@ -2331,7 +2383,7 @@ _containai_set_global_key() {
     fi
 
     # Call parse-toml.py --set-key
-    if ! python3 "$script_dir/parse-toml.py" --file "$user_config" --set-key "$key" "$value"; then
+    if ! _containai_parse_toml "$script_dir" --file "$user_config" --set-key "$key" "$value"; then
         printf '%s\n' "[ERROR] Failed to set global key" >&2
         return 1
     fi
@@ -2430,7 +2482,7 @@ _containai_detect_parent_workspace() {
     # Parse user config once and extract all workspace paths as a set
     local config_workspace_set=""
     if [[ -f "$user_config" ]]; then
-        config_workspace_set=$(python3 "$script_dir/parse-toml.py" --file "$user_config" --json 2>/dev/null | python3 -c "
+        config_workspace_set=$(_containai_parse_toml "$script_dir" --file "$user_config" --json 2>/dev/null | python3 -c "
 import json
 import sys
 
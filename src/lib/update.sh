@@ -555,7 +555,7 @@ _cai_update_check_get_interval() {
             if script_dir="$(cd -- "$(dirname "${BASH_SOURCE[0]}")/.." 2>/dev/null && pwd)"; then
                 local interval
                 # Parse update.check_interval from config
-                interval=$(python3 "$script_dir/parse-toml.py" --file "$config_file" --key "update.check_interval" 2>/dev/null) || interval=""
+                interval=$(_containai_parse_toml "$script_dir" --file "$config_file" --key "update.check_interval" 2>/dev/null) || interval=""
                 if [[ -n "$interval" ]]; then
                     printf '%s' "$interval"
                     return 0
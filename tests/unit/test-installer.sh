@@ -238,7 +238,7 @@ EOF
 }
 
 test_install_from_local_copies_parse_toml() {
-    test_start "install_from_local copies parse-toml.py runtime dependency"
+    test_start "install_from_local copies parse-toml.py runtime dependencies"
 
     local tmpdir source_dir install_dir bin_dir
     tmpdir="$(mktemp -d)"
@@ -272,6 +272,11 @@ EOF
 print("{}")
 EOF
 
+    cat >"$source_dir/containai_toml.py" <<'EOF'
+def main():
+    print("{}")
+EOF
+
     cat >"$source_dir/container/Dockerfile.template-system" <<'EOF'
 FROM scratch
 EOF
@@ -289,10 +294,12 @@ EOF
         return
     fi
 
-    if [[ -f "$install_dir/parse-toml.py" ]]; then
-        test_pass
+    if [[ ! -f "$install_dir/parse-toml.py" ]] || [[ ! -f "$install_dir/containai_toml.py" ]]; then
+        test_fail "expected parse-toml.py and containai_toml.py in install dir"
+    elif command -v python3 >/dev/null 2>&1 && ! compgen -G "$install_dir/__pycache__/containai_toml.*.pyc" >/dev/null; then
+        test_fail "expected containai_toml.py to be precompiled in install dir"
     else
-        test_fail "expected parse-toml.py in install dir"
+        test_pass
     fi
 
     rm -rf "$tmpdir"
@@ -333,6 +340,11 @@ EOF
 print("{}")
 EOF
 
+    cat >"$source_dir/containai_toml.py" <<'EOF'
+def main():
+    print("{}")
+EOF
+
     cat >"$source_dir/container/Dockerfile.template-system" <<'EOF'
 FROM scratch
 EOF
@@ -394,6 +406,11 @@ EOF
 print("{}")
 EOF
 
+    cat >"$source_dir/containai_toml.py" <<'EOF'
+def main():
+    print("{}")
+EOF
+
     cat >"$source_dir/container/Dockerfile.template-system" <<'EOF'
 FROM scratch
 EOF
@@ -428,10 +445,11 @@ EOF
 
 test_package_release_script_copies_parse_toml() {
     test_start "package-release script includes parse-toml.py in tarball payload"
-    if grep -q 'cp "\$SRC_DIR/parse-toml.py" "\$PACKAGE_DIR/parse-toml.py"' "$REPO_ROOT/scripts/package-release.sh"; then
+    if grep -q 'cp "\$SRC_DIR/parse-toml.py" "\$PACKAGE_DIR/parse-toml.py"' "$REPO_ROOT/scripts/package-release.sh" &&
+        grep -q 'cp "\$SRC_DIR/containai_toml.py" "\$PACKAGE_DIR/containai_toml.py"' "$REPO_ROOT/scripts/package-release.sh"; then
         test_pass
     else
-        test_fail "scripts/package-release.sh does not copy parse-toml.py"
+        test_fail "scripts/package-release.sh does not copy parse-toml.py and containai_toml.py"
     fi
 }
 
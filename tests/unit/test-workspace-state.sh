@@ -41,6 +41,7 @@ test_fail() {
 setup() {
     TEST_TMPDIR="$(mktemp -d)"
     export XDG_CONFIG_HOME="$TEST_TMPDIR/config"
+    export XDG_CACHE_HOME="$TEST_TMPDIR/cache"
 }
 
 teardown() {
@@ -214,6 +215,24 @@ else
 fi
 teardown
 
+# ==============================================================================
+# Test: parse-toml.py --set-workspace-key skips rewriting an unchanged file
+# ==============================================================================
+
+test_start "parse-toml.py --set-workspace-key skips rewriting an unchanged file"
+setup
+_containai_write_workspace_state "/tmp/test-workspace" "data_volume" "test-vol"
+config_file="$TEST_TMPDIR/config/containai/config.toml"
+inode_before=$(stat -c '%i' "$config_file" 2>/dev/null || stat -f '%i' "$config_file")
+_containai_write_workspace_state "/tmp/test-workspace" "data_volume" "test-vol"
+inode_after=$(stat -c '%i' "$config_file" 2>/dev/null || stat -f '%i' "$config_file")
+if [[ "$inode_before" == "$inode_after" ]]; then
+    test_pass
+else
+    test_fail "file was replaced (inode $inode_before -> $inode_after)"
+fi
+teardown
+
 # ==============================================================================
 # Test: Empty value is allowed
 # ==============================================================================
@@ -233,6 +252,159 @@ else
 fi
 teardown
 
+# ==============================================================================
+# Test: parse-toml.py parse cache picks up same-size rewrites
+# ==============================================================================
+
+test_start "parse-toml.py parse cache picks up same-size rewrites"
+setup
+mkdir -p "$TEST_TMPDIR/config/containai"
+config_file="$TEST_TMPDIR/config/containai/config.toml"
+printf '[agent]\ndata_volume = "vol-a"\n' >"$config_file"
+first=$(python3 "$REPO_ROOT/src/parse-toml.py" --file "$config_file" --key agent.data_volume)
+printf '[agent]\ndata_volume = "vol-b"\n' >"$config_file"
+second=$(python3 "$REPO_ROOT/src/parse-toml.py" --file "$config_file" --key agent.data_volume)
+cache_perms=$(stat -c '%a' "$TEST_TMPDIR/cache/containai/toml" 2>/dev/null || stat -f '%Lp' "$TEST_TMPDIR/cache/containai/toml")
+if [[ "$first" == "vol-a" ]] && [[ "$second" == "vol-b" ]] && [[ "$cache_perms" == "700" ]]; then
+    test_pass
+else
+    test_fail "expected vol-a/vol-b with 700 cache dir, got '$first'/'$second' ($cache_perms)"
+fi
+teardown
+
+# ==============================================================================
+# Test: parse-toml.py parse cache ignores relative cache roots
+# ==============================================================================
+
+test_start "parse-toml.py parse cache ignores relative cache roots"
+setup
+mkdir -p "$TEST_TMPDIR/config/containai" "$TEST_TMPDIR/home" "$TEST_TMPDIR/work"
+config_file="$TEST_TMPDIR/config/containai/config.toml"
+printf '[agent]\ndata_volume = "vol-a"\n' >"$config_file"
+first=$(cd "$TEST_TMPDIR/work" && XDG_CACHE_HOME=relcache HOME="$TEST_TMPDIR/home" \
+    python3 "$REPO_ROOT/src/parse-toml.py" --file "$config_file" --key agent.data_volume)
+second=$(cd "$TEST_TMPDIR/work" && env -u XDG_CACHE_HOME HOME=relhome \
+    python3 "$REPO_ROOT/src/parse-toml.py" --file "$config_file" --key agent.data_volume)
+if [[ "$first" == "vol-a" ]] && [[ "$second" == "vol-a" ]] && \
+   [[ -d "$TEST_TMPDIR/home/.cache/containai/toml" ]] && \
+   [[ -z "$(ls -A "$TEST_TMPDIR/work")" ]]; then
+    test_pass
+else
+    test_fail "expected vol-a twice, cached under \$HOME only, got '$first'/'$second'"
+    ls -AR "$TEST_TMPDIR/work" >&2
+fi
+teardown
+
+# ==============================================================================
+# Test: parse-toml.py --serve answers like a direct call
+# ==============================================================================
+
+test_start "parse-toml.py --serve answers like a direct call"
+setup
+mkdir -p "$TEST_TMPDIR/config/containai"
+config_file="$TEST_TMPDIR/config/containai/config.toml"
+socket_path="$TEST_TMPDIR/serve.sock"
+# Floats are spelled by json even though the server encodes with orjson
+printf '[agent]\ndata_volume = "vol-a"\nratio = 5e-05\n' >"$config_file"
+python3 "$REPO_ROOT/src/parse-toml.py" --serve "$socket_path" &
+serve_pid=$!
+for _ in $(seq 50); do
+    [[ -S "$socket_path" ]] && break
+    sleep 0.1
+done
+# Minimal client: NUL-separated cwd + argv in, "rc\0stdout\0stderr\0" out
+served=$(python3 -c '
+import os, socket, sys
+s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+s.connect(sys.argv[1])
+s.sendall(b"".join(os.fsencode(a) + b"\0" for a in [os.getcwd()] + sys.argv[2:]))
+s.shutdown(socket.SHUT_WR)
+data = b""
+while chunk := s.recv(65536):
+    data += chunk
+rc, out, err, _ = data.split(b"\0")
+sys.stdout.buffer.write(rc + b" " + out)
+' "$socket_path" --file "$config_file" --json)
+direct=$(python3 "$REPO_ROOT/src/parse-toml.py" --file "$config_file" --json)
+socket_perms=$(stat -c '%a' "$socket_path" 2>/dev/null || stat -f '%Lp' "$socket_path")
+kill "$serve_pid" 2>/dev/null || true
+wait "$serve_pid" 2>/dev/null || true
+if [[ "$served" == "0 $direct" ]] && [[ "$socket_perms" == "600" ]] && [[ ! -e "$socket_path" ]]; then
+    test_pass
+else
+    test_fail "expected '0 $direct' on a 600 socket removed on exit, got '$served' ($socket_perms)"
+fi
+teardown
+
+# ==============================================================================
+# Test: parse-toml.py --serve exits on SIGTERM during a request
+# ==============================================================================
+
+test_start "parse-toml.py --serve exits on SIGTERM during a request"
+setup
+socket_path="$TEST_TMPDIR/serve.sock"
+fifo="$TEST_TMPDIR/config.fifo"
+mkfifo "$fifo"
+python3 "$REPO_ROOT/src/parse-toml.py" --serve "$socket_path" &
+serve_pid=$!
+for _ in $(seq 50); do
+    [[ -S "$socket_path" ]] && break
+    sleep 0.1
+done
+# The server blocks reading the FIFO, so SIGTERM lands mid-request
+python3 -c '
+import os, socket, sys
+s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+s.connect(sys.argv[1])
+s.sendall(b"".join(os.fsencode(a) + b"\0" for a in [os.getcwd()] + sys.argv[2:]))
+s.shutdown(socket.SHUT_WR)
+data = b""
+while chunk := s.recv(65536):
+    data += chunk
+sys.stdout.buffer.write(data.split(b"\0")[0] if data else b"none")
+' "$socket_path" --file "$fifo" --exists nope >"$TEST_TMPDIR/client.out" &
+client_pid=$!
+exec 3>"$fifo" # Returns once the server has opened the FIFO
+kill -TERM "$serve_pid"
+for _ in $(seq 50); do
+    kill -0 "$serve_pid" 2>/dev/null || break
+    sleep 0.1
+done
+if kill -0 "$serve_pid" 2>/dev/null; then
+    serve_alive=1
+    kill -KILL "$serve_pid" 2>/dev/null || true
+else
+    serve_alive=0
+fi
+exec 3>&-
+wait "$serve_pid" 2>/dev/null || true
+wait "$client_pid" 2>/dev/null || true
+answer=$(cat "$TEST_TMPDIR/client.out")
+if [[ "$serve_alive" == "0" ]] && [[ "$answer" == "none" ]] && [[ ! -e "$socket_path" ]]; then
+    test_pass
+else
+    test_fail "expected server gone, no answer and no socket; alive=$serve_alive answer='$answer'"
+fi
+teardown
+
+# ==============================================================================
+# Test: _containai_parse_toml runs parse-toml.py directly without a server
+# ==============================================================================
+
+test_start "_containai_parse_toml falls back when CONTAINAI_TOML_SOCKET is not a socket"
+setup
+mkdir -p "$TEST_TMPDIR/config/containai"
+config_file="$TEST_TMPDIR/config/containai/config.toml"
+printf '[agent]\ndata_volume = "vol-a"\n' >"$config_file"
+result=$(CONTAINAI_TOML_SOCKET="$TEST_TMPDIR/missing.sock" \
+    _containai_parse_toml "$REPO_ROOT/src" --file "$config_file" --key agent.data_volume)
+if [[ "$result" == "vol-a" ]]; then
+    test_pass
+else
+    test_fail "expected 'vol-a', got '$result'"
+fi
+teardown
+
 # ==============================================================================
 # Test: Mutual exclusion of options
 # ==============================================================================